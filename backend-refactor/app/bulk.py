@@ -0,0 +1,245 @@
+"""
+Bulk export and import of the DynamoDB tables.
+
+Exports run a parallel, paginated scan and stream the items out as
+gzip-compressed NDJSON (or Parquet when pyarrow is installed), holding at most
+a few pages in memory. Imports read gzip NDJSON line by line and write with
+batched puts. User exports never include password hashes; importing users
+keeps the hash already stored for an existing user_id.
+
+    python -m app.bulk export Users users.ndjson.gz
+    python -m app.bulk export Posts posts.parquet --format parquet
+    python -m app.bulk import Requests requests.ndjson.gz
+"""
+
+import argparse, gzip, io, json, queue, sys, threading
+from decimal import Decimal
+
+from app.db import users_table, posts_table, requests_table, notifications_table, announcements_table
+from app.db import projection, json_default, batch_get, USER_PUBLIC_FIELDS
+from app import changefeed
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+EXPORT_TABLES = {
+    "Users": {"table": users_table, "fields": USER_PUBLIC_FIELDS + ("S3_Key",)},
+    "Posts": {"table": posts_table},
+    "Requests": {"table": requests_table},
+    "FloodNotifications": {"table": notifications_table},
+    "GlobalAnnouncements": {"table": announcements_table},
+}
+
+# Imported rows show up in these dashboard change feeds
+FEED_ENTITIES = {"Users": "users", "Requests": "requests", "FloodNotifications": "notifications", "GlobalAnnouncements": "announcements"}
+
+# Attributes an import must never overwrite with "missing"
+PRESERVED_ON_IMPORT = {"Users": ("password",)}
+
+DEFAULT_SEGMENTS = 4
+PAGE_SIZE = 500
+CHUNK_BYTES = 64 * 1024
+PARQUET_ROWS = 5000
+
+def _parallel_scan(table, segments, **kwargs):
+    """Yield every item using `segments` concurrent scan workers."""
+    pages = queue.Queue(maxsize=segments * 2)
+    stop = threading.Event()
+    done = object()
+
+    def worker(segment):
+        params = dict(kwargs, Segment=segment, TotalSegments=segments, Limit=PAGE_SIZE)
+        try:
+            while not stop.is_set():
+                response = table.scan(**params)
+                _put(response.get("Items", []))
+                if "LastEvaluatedKey" not in response:
+                    break
+                params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        except Exception as e:
+            _put(e)
+        _put(done)
+
+    def _put(value):
+        # Bounded queue: workers wait here while the consumer is slow
+        while not stop.is_set():
+            try:
+                pages.put(value, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    threads = [threading.Thread(target=worker, args=(segment,), daemon=True) for segment in range(segments)]
+    for thread in threads:
+        thread.start()
+    try:
+        remaining = segments
+        while remaining:
+            page = pages.get()
+            if page is done:
+                remaining -= 1
+            elif isinstance(page, Exception):
+                raise page
+            else:
+                yield from page
+    finally:
+        stop.set()
+
+def scan_table(name, segments=DEFAULT_SEGMENTS):
+    spec = EXPORT_TABLES[name]
+    kwargs = projection(*spec["fields"]) if "fields" in spec else {}
+    return _parallel_scan(spec["table"], segments, **kwargs)
+
+def ndjson_gz_chunks(items):
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode="wb") as gz:
+        for item in items:
+            gz.write((json.dumps(item, default=json_default, separators=(",", ":")) + "\n").encode("utf-8"))
+            if buffer.tell() >= CHUNK_BYTES:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+    yield buffer.getvalue()
+
+class _ChunkSink(io.RawIOBase):
+    # Write-only sink for ParquetWriter; tell() must keep counting across
+    # drains because the footer records absolute offsets.
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def _parquet_value(value):
+    return value if isinstance(value, str) or value is None else json.dumps(value, default=json_default)
+
+def parquet_chunks(items):
+    """
+    Parquet needs a fixed schema, so every attribute is stored as a string
+    column (non-string values JSON-encoded). Columns are taken from the first
+    row group; attributes first seen later go into a JSON `_extra` column.
+    """
+    if pa is None:
+        raise RuntimeError("Parquet export requires pyarrow")
+    sink = _ChunkSink()
+    writer = None
+    columns = None
+    rows = []
+
+    def write_rows():
+        nonlocal writer, columns
+        if columns is None:
+            columns = sorted({key for row in rows for key in row})
+        data = {column: [_parquet_value(row.get(column)) for row in rows] for column in columns}
+        extras = [{k: v for k, v in row.items() if k not in data} for row in rows]
+        data["_extra"] = [json.dumps(extra, default=json_default) if extra else None for extra in extras]
+        table = pa.table(data, schema=pa.schema([(column, pa.string()) for column in data]))
+        if writer is None:
+            writer = pq.ParquetWriter(sink, table.schema, compression="gzip")
+        writer.write_table(table)
+        rows.clear()
+
+    for item in items:
+        rows.append(item)
+        if len(rows) >= PARQUET_ROWS:
+            write_rows()
+            data = sink.drain()
+            if data:
+                yield data
+    if rows or writer is None:
+        write_rows()
+    writer.close()
+    yield sink.drain()
+
+def export_chunks(name, fmt="ndjson", segments=DEFAULT_SEGMENTS):
+    items = scan_table(name, segments)
+    return parquet_chunks(items) if fmt == "parquet" else ndjson_gz_chunks(items)
+
+def import_items(name, items, batch_size=500):
+    """Batch-write items into a table. Returns the number written."""
+    table = EXPORT_TABLES[name]["table"]
+    key_names = [k["AttributeName"] for k in table.key_schema]
+    preserved = PRESERVED_ON_IMPORT.get(name, ())
+    written = 0
+    batch = []
+
+    def flush():
+        if preserved:
+            # BatchGetItem rejects duplicate keys in one request
+            keys = list({tuple(item[k] for k in key_names): {k: item[k] for k in key_names} for item in batch}.values())
+            existing = {
+                tuple(item[k] for k in key_names): item
+                for item in batch_get(table, keys, **projection(*key_names, *preserved))
+            }
+            for item in batch:
+                current = existing.get(tuple(item[k] for k in key_names), {})
+                for attribute in preserved:
+                    if attribute in current and attribute not in item:
+                        item[attribute] = current[attribute]
+        with table.batch_writer(overwrite_by_pkeys=key_names) as writer:
+            for item in batch:
+                writer.put_item(Item=item)
+        if name in FEED_ENTITIES:
+            changefeed.record_many(FEED_ENTITIES[name], [item[key_names[0]] for item in batch])
+        batch.clear()
+
+    for item in items:
+        batch.append(item)
+        written += 1
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return written
+
+def read_ndjson_gz(fileobj):
+    with gzip.GzipFile(fileobj=fileobj, mode="rb") as gz:
+        for line in gz:
+            line = line.strip()
+            if line:
+                # DynamoDB rejects floats, so keep non-integers as Decimal
+                yield json.loads(line, parse_float=Decimal)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.bulk", description="Bulk export/import of DynamoDB tables")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_cmd = commands.add_parser("export")
+    export_cmd.add_argument("table", choices=sorted(EXPORT_TABLES))
+    export_cmd.add_argument("path", help="output file, or - for stdout")
+    export_cmd.add_argument("--format", choices=["ndjson", "parquet"], default="ndjson")
+    export_cmd.add_argument("--segments", type=int, default=DEFAULT_SEGMENTS)
+    import_cmd = commands.add_parser("import")
+    import_cmd.add_argument("table", choices=sorted(EXPORT_TABLES))
+    import_cmd.add_argument("path", help="gzip NDJSON file, or - for stdin")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        out = sys.stdout.buffer if args.path == "-" else open(args.path, "wb")
+        with out:
+            for chunk in export_chunks(args.table, args.format, args.segments):
+                out.write(chunk)
+    else:
+        source = sys.stdin.buffer if args.path == "-" else open(args.path, "rb")
+        with source:
+            count = import_items(args.table, read_ndjson_gz(source))
+        print(f"Imported {count} items into {args.table}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
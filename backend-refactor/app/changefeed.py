@@ -0,0 +1,150 @@
+"""
+Change feed for the admin dashboards.
+
+Every write to a dashboard entity appends (entity, seq, item_id, op) to the
+ChangeLog table, where seq is a sortable UTC timestamp. A client keeps the
+cursor from its last call and asks for everything after it, getting back the
+current version of each changed item plus tombstones for deleted ids.
+Entries expire after RETENTION via DynamoDB TTL.
+
+CHANGE_FEED_BACKEND=memory keeps the log in process instead. It stands in for
+the table when developing locally and only works with a single worker.
+"""
+
+import os, threading, time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from boto3.dynamodb.conditions import Key
+from app.db import change_log_table, users_table, requests_table, notifications_table, announcements_table
+from app.db import projection, batch_get, USER_PUBLIC_FIELDS
+
+ENTITIES = {
+    "notifications": {"table": notifications_table, "key": "notification_id"},
+    "requests": {"table": requests_table, "key": "request_id"},
+    "users": {"table": users_table, "key": "user_id", "fields": USER_PUBLIC_FIELDS},
+    "announcements": {"table": announcements_table, "key": "announcement_id"},
+}
+
+RETENTION = timedelta(days=7)
+# Re-read this much before the cursor so writes from servers with a slightly
+# lagging clock are not skipped; replayed upserts are harmless.
+OVERLAP = timedelta(seconds=5)
+SEQ_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+class DynamoChangeLog:
+    def append(self, records):
+        with change_log_table.batch_writer() as batch:
+            for record in records:
+                batch.put_item(Item=record)
+
+    def since(self, entity, after):
+        query = {
+            "KeyConditionExpression": Key("entity").eq(entity) & Key("seq").gt(after),
+            "ConsistentRead": True,
+            **projection("seq", "item_id", "op")
+        }
+        while True:
+            response = change_log_table.query(**query)
+            yield from response.get("Items", [])
+            if "LastEvaluatedKey" not in response:
+                break
+            query["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+class MemoryChangeLog:
+    def __init__(self):
+        self.entries = {entity: deque() for entity in ENTITIES}
+        self.lock = threading.Lock()
+
+    def append(self, records):
+        now = time.time()
+        with self.lock:
+            for record in records:
+                entries = self.entries[record["entity"]]
+                entries.append(record)
+                while entries and entries[0]["expires_at"] < now:
+                    entries.popleft()
+
+    def since(self, entity, after):
+        with self.lock:
+            return [record for record in self.entries[entity] if record["seq"] > after]
+
+_log = MemoryChangeLog() if os.getenv("CHANGE_FEED_BACKEND", "dynamodb") == "memory" else DynamoChangeLog()
+
+def _seq(moment):
+    return moment.strftime(SEQ_FORMAT)
+
+def _parse_cursor(updated_since):
+    # Raises ValueError on garbage, which the endpoint turns into a 400
+    moment = updated_since.split("#")[0]
+    if moment.endswith("Z"):
+        moment = moment[:-1] + "+00:00"
+    since = datetime.fromisoformat(moment)
+    if since.tzinfo is None:
+        return since, updated_since
+    # Plain ISO timestamps with an offset are accepted too; seqs are naive UTC
+    since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return since, _seq(since)
+
+def record_many(entity, item_ids, op="upsert"):
+    """
+    Best-effort: callers record after the real write has succeeded, so a
+    ChangeLog failure is logged and swallowed rather than turning that write
+    into an error the client would retry. A missed entry only means dashboards
+    pick the item up on their next full reload.
+    """
+    now = datetime.utcnow()
+    expires_at = int(time.time() + RETENTION.total_seconds())
+    try:
+        _log.append([
+            {
+                "entity": entity,
+                # Suffix keeps seq unique when two writes share a microsecond
+                "seq": f"{_seq(now)}#{uuid4().hex[:8]}",
+                "item_id": item_id,
+                "op": op,
+                "expires_at": expires_at
+            }
+            for item_id in item_ids
+        ])
+    except Exception as e:
+        print(f"Change feed append for {entity} failed: {e}")
+
+def record(entity, item_id, op="upsert"):
+    record_many(entity, [item_id], op)
+
+def changes_since(entity, updated_since=None):
+    """
+    Without updated_since, returns just a cursor to start following from.
+    If the cursor is older than the retention window the client has to reload
+    in full, which is signalled with reset=True.
+    """
+    now = datetime.utcnow()
+    result = {"cursor": _seq(now), "changes": [], "deleted": [], "reset": False}
+    if updated_since is None:
+        return result
+
+    since, cursor = _parse_cursor(updated_since)
+    if now - since > RETENTION - OVERLAP:
+        result["reset"] = True
+        return result
+
+    latest = {}
+    for entry in _log.since(entity, _seq(since - OVERLAP)):
+        latest[entry["item_id"]] = entry["op"]
+        cursor = max(cursor, entry["seq"])
+    # Advance past quiet periods too, or an idle client's cursor would age out
+    result["cursor"] = max(cursor, _seq(now - OVERLAP))
+
+    spec = ENTITIES[entity]
+    upserts = [item_id for item_id, op in latest.items() if op != "delete"]
+    kwargs = projection(*spec["fields"]) if "fields" in spec else {}
+    kwargs["ConsistentRead"] = True
+    items = list(batch_get(spec["table"], [{spec["key"]: item_id} for item_id in upserts], **kwargs))
+    found = {item[spec["key"]] for item in items}
+
+    result["changes"] = items
+    # Anything upserted but gone by now was deleted without a log entry reaching us yet
+    result["deleted"] = [item_id for item_id, op in latest.items() if op == "delete" or item_id not in found]
+    return result
@@ -1,4 +1,5 @@
-import boto3, os
+import boto3, os, random, time
+from decimal import Decimal
 from dotenv import load_dotenv
 from botocore.exceptions import ClientError
 
@@ -37,6 +38,63 @@ def create_table_if_not_exists(table_name, key_schema, attribute_definitions):
             print(f"Error creating table {table_name}: {e}")
             raise
 
+def enable_ttl(table, attribute_name):
+    # DynamoDB deletes items once the epoch seconds in this attribute pass
+    try:
+        dynamodb.meta.client.update_time_to_live(
+            TableName=table.name,
+            TimeToLiveSpecification={'Enabled': True, 'AttributeName': attribute_name}
+        )
+    except ClientError as e:
+        if 'already enabled' not in str(e):
+            print(f"Could not enable TTL on {table.name}: {e}")
+
+def projection(*fields):
+    # Builds ProjectionExpression kwargs for scan/get_item so only the listed
+    # attributes are read. Every name is aliased because several of ours
+    # (status, message, role, ...) are DynamoDB reserved words.
+    names = {f"#p{i}": field for i, field in enumerate(fields)}
+    return {
+        "ProjectionExpression": ", ".join(names),
+        "ExpressionAttributeNames": names
+    }
+
+def json_default(value):
+    # DynamoDB hands numbers back as Decimal, which json cannot encode
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Cannot serialise {type(value).__name__}")
+
+def scan_all(table, **kwargs):
+    # Follows LastEvaluatedKey so callers see every item, one page at a time
+    while True:
+        response = table.scan(**kwargs)
+        yield from response.get("Items", [])
+        if "LastEvaluatedKey" not in response:
+            break
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+def batch_get(table, keys, **kwargs):
+    # BatchGetItem takes at most 100 keys per call and may hand some back unprocessed
+    for start in range(0, len(keys), 100):
+        request = {table.name: {"Keys": keys[start:start + 100], **kwargs}}
+        delay = 0.05
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            yield from response["Responses"].get(table.name, [])
+            request = response.get("UnprocessedKeys") or None
+            if request:
+                # Unprocessed keys mean we are being throttled; back off before retrying
+                time.sleep(delay + random.uniform(0, delay))
+                delay = min(delay * 2, 2.0)
+
+# Attribute sets for the summary views of the list endpoints
+USER_PUBLIC_FIELDS = ("user_id", "username", "email", "role", "full_name", "S3_URL", "created_at", "updated_at")
+POST_SUMMARY_FIELDS = ("Post_ID", "Post_Title", "Post_Organization", "Post_IMG", "Post_S3Key", "Post_CreateDate")
+REQUEST_SUMMARY_FIELDS = ("request_id", "user_email", "user_name", "req_type", "req_region", "status", "created_at", "updated_at")
+NOTIFICATION_SUMMARY_FIELDS = ("notification_id", "title", "severity", "affected_regions", "is_active", "created_at", "updated_at")
+ANNOUNCEMENT_SUMMARY_FIELDS = ("announcement_id", "title", "is_active", "created_at", "updated_at")
+
 posts_table = create_table_if_not_exists(
     "Posts", # Table for Blog Posts
     [{'AttributeName': 'post_id', 'KeyType': 'HASH'}],
@@ -61,8 +119,25 @@ notifications_table = create_table_if_not_exists(
     [{'AttributeName': 'notification_id', 'AttributeType': 'S'}]
 )
 
+# Resolved requests and inactive notifications carry expires_at (see app.retention)
+enable_ttl(requests_table, "expires_at")
+enable_ttl(notifications_table, "expires_at")
+
 announcements_table = create_table_if_not_exists(
     "GlobalAnnouncements", # Table for Global Announcements
     [{'AttributeName': 'announcement_id', 'KeyType': 'HASH'}],
     [{'AttributeName': 'announcement_id', 'AttributeType': 'S'}]
 )
+
+region_snapshots_table = create_table_if_not_exists(
+    "RegionNotificationSnapshots", # Precomputed active notifications per region
+    [{'AttributeName': 'region', 'KeyType': 'HASH'}],
+    [{'AttributeName': 'region', 'AttributeType': 'S'}]
+)
+
+change_log_table = create_table_if_not_exists(
+    "ChangeLog", # Upserts and deletes per dashboard entity, for delta refreshes
+    [{'AttributeName': 'entity', 'KeyType': 'HASH'}, {'AttributeName': 'seq', 'KeyType': 'RANGE'}],
+    [{'AttributeName': 'entity', 'AttributeType': 'S'}, {'AttributeName': 'seq', 'AttributeType': 'S'}]
+)
+enable_ttl(change_log_table, "expires_at")
@@ -0,0 +1,349 @@
+"""
+Write-behind ingestion queue for citizen requests.
+
+/submit-request appends to a local SQLite (WAL) queue and returns straight
+away; a background thread batch-writes the queued items to the Requests table.
+Flushed rows are kept for IDEMPOTENCY_WINDOW seconds so a retried submission
+with the same Idempotency-Key is recognised instead of being written twice.
+
+Only first attempts of items without an Idempotency-Key go through the blind
+batch put. Retries and keyed items use a conditional put_item that never
+replaces an existing request, so a replay cannot undo an admin's edits. Items
+DynamoDB keeps rejecting are moved to a dead-letter state after MAX_ATTEMPTS
+instead of blocking the queue.
+
+Every worker process runs a flusher against the same file, so rows are claimed
+in an IMMEDIATE transaction before being written; a claim older than
+CLAIM_TIMEOUT is considered abandoned (crashed worker) and taken over. The same
+file holds the leases other background jobs use to run once per host.
+"""
+
+import json, os, sqlite3, threading, time
+from uuid import uuid4, uuid5, NAMESPACE_URL
+
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import ClientError
+from app.db import requests_table
+from app import changefeed
+
+QUEUE_PATH = os.getenv("INGEST_QUEUE_PATH", "ingest_queue.db")
+MAX_DEPTH = int(os.getenv("INGEST_MAX_DEPTH", "50000"))
+BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "100"))
+FLUSH_INTERVAL = float(os.getenv("INGEST_FLUSH_INTERVAL", "0.5"))
+MAX_BACKOFF = 30.0
+IDEMPOTENCY_WINDOW = 24 * 60 * 60
+MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "5"))
+CLAIM_TIMEOUT = 60.0
+# DynamoDB's item limit is 400KB; leave headroom for attributes added later
+# (status, admin_notes, ...)
+MAX_ITEM_BYTES = 300 * 1024
+RETRYABLE_ERRORS = {
+    "ProvisionedThroughputExceededException",
+    "ThrottlingException",
+    "RequestLimitExceeded",
+    "InternalServerError",
+    "ServiceUnavailable",
+}
+
+class QueueFull(Exception):
+    pass
+
+class InvalidItem(ValueError):
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+_local = threading.local()
+_worker_id = uuid4().hex
+_stop = threading.Event()
+_wake = threading.Event()
+_thread = None
+_metrics_lock = threading.Lock()
+_metrics = {
+    "enqueued_total": 0,
+    "duplicates_total": 0,
+    "rejected_total": 0,
+    "flushed_total": 0,
+    "flush_failures_total": 0,
+    "dead_lettered_total": 0,
+    "last_flush_at": None,
+    "last_flush_lag_seconds": None
+}
+
+def _connect():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(QUEUE_PATH, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Submissions are acknowledged before they reach DynamoDB, so every
+        # commit has to be on disk.
+        conn.execute("PRAGMA synchronous=FULL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS pending_requests (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                request_id TEXT NOT NULL UNIQUE,
+                user_email TEXT,
+                item TEXT NOT NULL,
+                enqueued_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                keyed INTEGER NOT NULL DEFAULT 0,
+                flushed_at REAL,
+                dead_at REAL,
+                last_error TEXT,
+                claimed_by TEXT,
+                claimed_at REAL
+            )
+        """)
+        # Queue files created before these columns existed
+        for column in ("keyed INTEGER NOT NULL DEFAULT 0", "dead_at REAL", "last_error TEXT", "claimed_by TEXT", "claimed_at REAL"):
+            try:
+                conn.execute(f"ALTER TABLE pending_requests ADD COLUMN {column}")
+            except sqlite3.OperationalError:
+                pass
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_pending_live ON pending_requests (flushed_at, dead_at, seq)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_pending_email ON pending_requests (user_email)")
+        conn.execute("CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, holder TEXT NOT NULL, expires_at REAL NOT NULL)")
+        _local.conn = conn
+    return conn
+
+def _immediate(conn, fn):
+    # BEGIN IMMEDIATE takes the write lock up front, so the read-then-update in
+    # fn cannot interleave with another process doing the same
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        result = fn()
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+    return result
+
+def acquire_lease(name, seconds):
+    """
+    Take or renew a named lease among the worker processes sharing this queue
+    file. Returns False while another live process holds it.
+    """
+    conn = _connect()
+
+    def take():
+        now = time.time()
+        row = conn.execute("SELECT holder, expires_at FROM leases WHERE name = ?", (name,)).fetchone()
+        if row and row[0] != _worker_id and row[1] > now:
+            return False
+        conn.execute("INSERT OR REPLACE INTO leases (name, holder, expires_at) VALUES (?, ?, ?)", (name, _worker_id, now + seconds))
+        return True
+    return _immediate(conn, take)
+
+def _claim(conn):
+    now = time.time()
+    rows = conn.execute(
+        "SELECT seq, item, enqueued_at, attempts, keyed FROM pending_requests "
+        "WHERE flushed_at IS NULL AND dead_at IS NULL AND (claimed_at IS NULL OR claimed_at < ?) ORDER BY seq LIMIT ?",
+        (now - CLAIM_TIMEOUT, BATCH_SIZE)
+    ).fetchall()
+    # Count the attempt as part of the claim: if we crash or fail midway, every
+    # later try for these rows takes the conditional path in flush_once.
+    conn.executemany(
+        "UPDATE pending_requests SET attempts = attempts + 1, claimed_by = ?, claimed_at = ? WHERE seq = ?",
+        [(_worker_id, now, row[0]) for row in rows]
+    )
+    return rows
+
+def _count(name, n=1):
+    with _metrics_lock:
+        _metrics[name] += n
+
+def new_request_id(user_email, idempotency_key=None):
+    # The same user and key always map to the same request_id, which is what
+    # makes client retries idempotent. Scoped per user so two clients picking
+    # the same key cannot collide.
+    if idempotency_key:
+        return str(uuid5(NAMESPACE_URL, f"submit-request:{user_email}:{idempotency_key}"))
+    return str(uuid4())
+
+def _item_size(item):
+    # Approximates DynamoDB's accounting: attribute names plus UTF-8 values
+    return sum(len(name.encode("utf-8")) + len(str(value).encode("utf-8")) for name, value in item.items())
+
+def _validate(item):
+    if not isinstance(item.get("request_id"), str) or not item["request_id"]:
+        raise InvalidItem("request_id is required")
+    for name, value in item.items():
+        if not isinstance(value, str):
+            raise InvalidItem(f"{name} must be a string")
+    if _item_size(item) > MAX_ITEM_BYTES:
+        raise InvalidItem("Request is too large.", status_code=413)
+
+def depth():
+    conn = _connect()
+    return conn.execute("SELECT COUNT(*) FROM pending_requests WHERE flushed_at IS NULL AND dead_at IS NULL").fetchone()[0]
+
+def enqueue(item, keyed=False):
+    """
+    Durably queue a Requests item. Returns False if it was already queued.
+    Raises InvalidItem for items DynamoDB would reject, so the client gets a
+    4xx now rather than a 202 for something that can never be saved.
+    """
+    _validate(item)
+    if depth() >= MAX_DEPTH:
+        _count("rejected_total")
+        raise QueueFull()
+    conn = _connect()
+    cursor = conn.execute(
+        "INSERT OR IGNORE INTO pending_requests (request_id, user_email, item, enqueued_at, keyed) VALUES (?, ?, ?, ?, ?)",
+        (item["request_id"], item.get("user_email"), json.dumps(item), time.time(), int(keyed))
+    )
+    if cursor.rowcount == 0:
+        _count("duplicates_total")
+        return False
+    _count("enqueued_total")
+    _wake.set()
+    return True
+
+def pending_for(email):
+    """Items accepted for this user that have not reached DynamoDB yet."""
+    conn = _connect()
+    rows = conn.execute(
+        "SELECT item FROM pending_requests WHERE flushed_at IS NULL AND dead_at IS NULL AND user_email = ? ORDER BY seq",
+        (email,)
+    ).fetchall()
+    return [json.loads(row[0]) for row in rows]
+
+def _mark_flushed(conn, seqs):
+    now = time.time()
+    conn.executemany("UPDATE pending_requests SET flushed_at = ? WHERE seq = ?", [(now, seq) for seq in seqs])
+
+def _put_if_absent(item):
+    """Conditional put; returns False if the request already exists in DynamoDB."""
+    try:
+        requests_table.put_item(Item=item, ConditionExpression=Attr("request_id").not_exists())
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+def flush_once():
+    """
+    Write the oldest batch to DynamoDB. Returns the number of items flushed.
+    Raises if some items failed with a retryable error, so the caller backs off.
+    """
+    conn = _connect()
+    rows = _immediate(conn, lambda: _claim(conn))
+    if not rows:
+        return 0
+
+    # Only this process saw these rows at attempts == 0, so only it may
+    # write them without a condition
+    fresh = [row for row in rows if row[3] == 0 and not row[4]]
+    retried = [row for row in rows if row[3] > 0 or row[4]]
+
+    flushed = []
+    failure = None
+    if fresh:
+        try:
+            # batch_writer groups puts into 25-item BatchWriteItem calls and
+            # resubmits any UnprocessedItems DynamoDB hands back.
+            with requests_table.batch_writer(overwrite_by_pkeys=["request_id"]) as batch:
+                for _, item, *_ in fresh:
+                    batch.put_item(Item=json.loads(item))
+            _mark_flushed(conn, [row[0] for row in fresh])
+            flushed += fresh
+        except Exception as e:
+            # One bad item fails the whole call; next round retries these one by one
+            failure = e
+
+    for row in retried:
+        if failure is not None:
+            break
+        seq, item, _, attempts, _ = row
+        try:
+            if not _put_if_absent(json.loads(item)):
+                _count("duplicates_total")
+        except Exception as e:
+            retryable = not isinstance(e, ClientError) or e.response['Error']['Code'] in RETRYABLE_ERRORS
+            if retryable:
+                failure = e
+                break
+            if attempts + 1 >= MAX_ATTEMPTS:
+                conn.execute("UPDATE pending_requests SET dead_at = ?, last_error = ? WHERE seq = ?", (time.time(), str(e), seq))
+                _count("dead_lettered_total")
+                print(f"Ingest dead-lettered request {json.loads(item)['request_id']}: {e}")
+            else:
+                conn.execute("UPDATE pending_requests SET last_error = ? WHERE seq = ?", (str(e), seq))
+            continue
+        _mark_flushed(conn, [seq])
+        flushed.append(row)
+
+    # Hand unwritten rows back straight away rather than after CLAIM_TIMEOUT
+    conn.execute(
+        "UPDATE pending_requests SET claimed_by = NULL, claimed_at = NULL WHERE claimed_by = ? AND flushed_at IS NULL",
+        (_worker_id,)
+    )
+
+    if flushed:
+        now = time.time()
+        conn.execute("DELETE FROM pending_requests WHERE flushed_at IS NOT NULL AND flushed_at < ?", (now - IDEMPOTENCY_WINDOW,))
+        with _metrics_lock:
+            _metrics["flushed_total"] += len(flushed)
+            _metrics["last_flush_at"] = now
+            _metrics["last_flush_lag_seconds"] = round(now - flushed[0][2], 3)
+        changefeed.record_many("requests", [json.loads(row[1])["request_id"] for row in flushed])
+
+    if failure is not None:
+        _count("flush_failures_total")
+        raise failure
+    return len(flushed)
+
+def _run():
+    backoff = FLUSH_INTERVAL
+    while not _stop.is_set():
+        try:
+            flushed = flush_once()
+            backoff = FLUSH_INTERVAL
+        except Exception as e:
+            # Usually throttling during a surge: keep the items and back off
+            print(f"Ingest flush failed, retrying in {backoff:.1f}s: {e}")
+            _stop.wait(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF)
+            continue
+        if flushed < BATCH_SIZE:
+            _wake.wait(FLUSH_INTERVAL)
+            _wake.clear()
+
+def start_flusher():
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_run, name="ingest-flusher", daemon=True)
+    _thread.start()
+
+def stop_flusher(timeout=10.0):
+    global _thread
+    _stop.set()
+    _wake.set()
+    if _thread is not None:
+        _thread.join(timeout)
+        _thread = None
+    # Best-effort drain; anything left stays on disk for the next start
+    deadline = time.time() + timeout
+    try:
+        while time.time() < deadline and flush_once():
+            pass
+    except Exception as e:
+        print(f"Ingest drain on shutdown failed: {e}")
+
+def metrics():
+    conn = _connect()
+    queued, oldest = conn.execute(
+        "SELECT COUNT(*), MIN(enqueued_at) FROM pending_requests WHERE flushed_at IS NULL AND dead_at IS NULL"
+    ).fetchone()
+    dead = conn.execute("SELECT COUNT(*) FROM pending_requests WHERE dead_at IS NOT NULL").fetchone()[0]
+    with _metrics_lock:
+        snapshot = dict(_metrics)
+    snapshot["queue_depth"] = queued
+    snapshot["dead_letter_depth"] = dead
+    snapshot["max_depth"] = MAX_DEPTH
+    snapshot["flush_lag_seconds"] = round(time.time() - oldest, 3) if oldest else 0.0
+    return snapshot
@@ -1,16 +1,37 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from app import ingest, region_snapshots, retention
+from app.ratelimit import RateLimitMiddleware, LoadSheddingMiddleware, build_store
 from app.routers.tp069502_posts import router as tp069502_router
 from app.routers.tp070007_auth import router as tp070007_router
 from app.routers.tp065584_users import router as tp065584_router
 from app.routers.tp070572_admin import router as tp070572_router
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        # Public reads treat a missing snapshot as "no notifications"
+        region_snapshots.rebuild_all()
+    except Exception as e:
+        print(f"Region snapshot rebuild on startup failed: {e}")
+    ingest.start_flusher()
+    retention.start_scheduler()
+    yield
+    retention.stop_scheduler()
+    ingest.stop_flusher()
+
 app = FastAPI(
     title="Cloud60 Flood Management System",
     description="Backend API for flood management and emergency response system",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Added innermost first: CORS wraps everything so 429/503 responses stay
+# readable by the browser, and shedding is checked before rate limits.
+app.add_middleware(RateLimitMiddleware, store=build_store())
+app.add_middleware(LoadSheddingMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -0,0 +1,197 @@
+"""
+Rate limiting and load shedding middleware.
+
+RateLimitMiddleware applies token buckets to the unauthenticated endpoints,
+keyed per client IP and per route. Buckets live in process memory, or in Redis
+when RATE_LIMIT_REDIS_URL is set so all workers share them (needs the optional
+`redis` package). LoadSheddingMiddleware caps in-flight requests and answers
+503 straight away instead of letting work pile up in the threadpool.
+"""
+
+import math, os, time
+from collections import OrderedDict
+from starlette.responses import JSONResponse
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+# path -> {"ip": (tokens/sec, burst), "route": (tokens/sec, burst)}
+RATE_LIMITS = {
+    "/login": {"ip": (0.5, 5), "route": (50.0, 100)},
+    "/register": {"ip": (0.1, 3), "route": (10.0, 20)},
+    "/admin/admin-login": {"ip": (0.2, 5), "route": (5.0, 10)},
+    "/admin/create-admin-user": {"ip": (0.05, 2), "route": (1.0, 5)},
+    "/admin/public/notifications": {"ip": (2.0, 20), "route": (500.0, 1000)},
+}
+
+# Password hashing runs in the threadpool, so these get their own ceiling
+ROUTE_CONCURRENCY = {
+    "/login": 8,
+    "/register": 8,
+    "/admin/admin-login": 4,
+    "/admin/create-admin-user": 2,
+}
+
+MAX_IN_FLIGHT = int(os.getenv("LOAD_SHED_MAX_IN_FLIGHT", "100"))
+TRUST_PROXY = os.getenv("TRUST_PROXY", "false").lower() == "true"
+# Number of our own proxies in front of the app; each appends one
+# X-Forwarded-For entry, so the client is that many entries from the right.
+TRUSTED_PROXY_HOPS = max(1, int(os.getenv("TRUSTED_PROXY_HOPS", "1")))
+
+_metrics = {"rate_limited": {}, "shed": {}, "in_flight": 0}
+
+def _bump(bucket, path):
+    _metrics[bucket][path] = _metrics[bucket].get(path, 0) + 1
+
+def metrics():
+    return {
+        "rate_limited": dict(_metrics["rate_limited"]),
+        "shed": dict(_metrics["shed"]),
+        "in_flight": _metrics["in_flight"],
+        "max_in_flight": MAX_IN_FLIGHT
+    }
+
+class MemoryBucketStore:
+    MAX_KEYS = 100_000
+
+    def __init__(self):
+        # Least recently used first, so eviction is O(1) at any size
+        self.buckets = OrderedDict()
+
+    async def take(self, key, rate, burst):
+        """Consume one token. Returns 0 if allowed, else seconds until one is free."""
+        now = time.monotonic()
+        tokens, last = self.buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - last) * rate)
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / rate
+        self.buckets[key] = (tokens, now)
+        self.buckets.move_to_end(key)
+        # Hard cap: an evicted bucket just starts full again next time
+        while len(self.buckets) > self.MAX_KEYS:
+            self.buckets.popitem(last=False)
+        return retry_after
+
+class RedisBucketStore:
+    SCRIPT = """
+    local rate = tonumber(ARGV[1])
+    local burst = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+    local retry_after = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        retry_after = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+    return tostring(retry_after)
+    """
+
+    def __init__(self, url):
+        self.client = aioredis.from_url(url)
+        self.script = self.client.register_script(self.SCRIPT)
+
+    async def take(self, key, rate, burst):
+        try:
+            result = await self.script(keys=[f"ratelimit:{key}"], args=[rate, burst, time.time()])
+        except Exception as e:
+            # Fail open: an unreachable limiter must not take the API down
+            print(f"Rate limit backend unavailable: {e}")
+            return 0.0
+        return float(result)
+
+def build_store():
+    url = os.getenv("RATE_LIMIT_REDIS_URL")
+    if url:
+        if aioredis is None:
+            raise RuntimeError("RATE_LIMIT_REDIS_URL is set but the redis package is not installed")
+        return RedisBucketStore(url)
+    return MemoryBucketStore()
+
+def client_ip(scope):
+    if TRUST_PROXY:
+        # Entries left of the ones our proxies added are whatever the client
+        # sent, so never trust the leftmost one.
+        forwarded = [
+            entry.strip()
+            for name, value in scope.get("headers", [])
+            if name == b"x-forwarded-for"
+            for entry in value.decode("latin-1").split(",")
+            if entry.strip()
+        ]
+        if forwarded:
+            return forwarded[max(0, len(forwarded) - TRUSTED_PROXY_HOPS)]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+def _reject(status_code, detail, retry_after):
+    return JSONResponse(
+        status_code=status_code,
+        content={"detail": detail},
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+class RateLimitMiddleware:
+    def __init__(self, app, store=None, limits=RATE_LIMITS):
+        self.app = app
+        self.store = store or MemoryBucketStore()
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope.get("path")) if scope["type"] == "http" else None
+        if limit is None or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        retry_after = 0.0
+        if "ip" in limit:
+            retry_after = await self.store.take(f"ip:{path}:{client_ip(scope)}", *limit["ip"])
+        if not retry_after and "route" in limit:
+            retry_after = await self.store.take(f"route:{path}", *limit["route"])
+        if retry_after:
+            _bump("rate_limited", path)
+            await _reject(429, "Too many requests, please slow down.", retry_after)(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+class LoadSheddingMiddleware:
+    def __init__(self, app, max_in_flight=MAX_IN_FLIGHT, route_concurrency=ROUTE_CONCURRENCY):
+        self.app = app
+        self.max_in_flight = max_in_flight
+        self.route_concurrency = route_concurrency
+        self.route_in_flight = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Everything runs on one event loop per worker, so plain counters are safe
+        path = scope["path"]
+        route_limit = self.route_concurrency.get(path)
+        if _metrics["in_flight"] >= self.max_in_flight or (route_limit is not None and self.route_in_flight.get(path, 0) >= route_limit):
+            # Arbitrary paths are shed too; don't let them mint counter keys
+            _bump("shed", path if route_limit is not None else "*")
+            await _reject(503, "Server is busy, please retry shortly.", 1)(scope, receive, send)
+            return
+
+        _metrics["in_flight"] += 1
+        if route_limit is not None:
+            self.route_in_flight[path] = self.route_in_flight.get(path, 0) + 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _metrics["in_flight"] -= 1
+            if route_limit is not None:
+                self.route_in_flight[path] -= 1
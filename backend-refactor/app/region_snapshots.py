@@ -0,0 +1,177 @@
+"""
+Precomputed per-region snapshots of active flood notifications.
+
+Each region has one item in RegionNotificationSnapshots holding a compact,
+pre-sorted JSON list of the notifications that currently apply to it, so the
+public feed for a region is a single keyed read (plus a short in-process
+cache). All snapshots are built once at startup; after that, admin writes
+patch only the regions they touch. With
+REGION_SNAPSHOT_S3=true the same JSON is also published to
+public/notifications/<region>.json for serving straight from S3/CDN.
+"""
+
+import json, os, threading, time
+from datetime import datetime
+from urllib.parse import quote
+
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import ClientError
+from app.db import notifications_table, region_snapshots_table, s3, BUCKET, projection, scan_all, json_default
+
+SNAPSHOT_FIELDS = ("notification_id", "title", "message", "severity", "affected_regions", "is_active", "created_at", "updated_at")
+SEVERITY_ORDER = {"critical": 4, "high": 3, "medium": 2, "low": 1}
+CACHE_TTL = float(os.getenv("REGION_SNAPSHOT_CACHE_TTL", "5"))
+CACHE_MAX_REGIONS = 1000
+PUBLISH_TO_S3 = os.getenv("REGION_SNAPSHOT_S3", "false").lower() == "true"
+MAX_PATCH_ATTEMPTS = 3
+
+_cache = {}
+_cache_lock = threading.Lock()
+# Regions whose patch failed after the notification itself was written
+_stale = set()
+
+def _compact(notification):
+    return {field: notification[field] for field in SNAPSHOT_FIELDS if field in notification}
+
+def _sort(notifications):
+    notifications.sort(key=lambda x: (SEVERITY_ORDER.get(x.get('severity', 'low'), 0), x.get('created_at', '')), reverse=True)
+    return notifications
+
+def _remember(region, notifications):
+    with _cache_lock:
+        if len(_cache) >= CACHE_MAX_REGIONS and region not in _cache:
+            _cache.clear()
+        _cache[region] = (time.monotonic(), notifications)
+
+def _store(region, notifications, expected_version=None):
+    payload = json.dumps(notifications, default=json_default, separators=(",", ":"))
+    item = {
+        "region": region,
+        "payload": payload,
+        "count": len(notifications),
+        "version": time.time_ns(),
+        "built_at": datetime.utcnow().isoformat()
+    }
+    if expected_version is None:
+        region_snapshots_table.put_item(Item=item)
+    else:
+        # Optimistic lock so two admins editing the same region cannot lose an update
+        region_snapshots_table.put_item(
+            Item=item,
+            ConditionExpression=Attr("version").not_exists() | Attr("version").eq(expected_version)
+        )
+    if PUBLISH_TO_S3:
+        s3.put_object(
+            Bucket=BUCKET,
+            Key=f"public/notifications/{quote(region, safe='')}.json",
+            Body=payload.encode("utf-8"),
+            ContentType="application/json",
+            CacheControl="public, max-age=30",
+            ACL="public-read"
+        )
+    _remember(region, json.loads(payload))
+
+def _build(region):
+    # Runs right after notification writes, so it must see them
+    items = scan_all(
+        notifications_table,
+        FilterExpression=Attr('is_active').eq(True) & Attr('affected_regions').contains(region),
+        ConsistentRead=True,
+        **projection(*SNAPSHOT_FIELDS)
+    )
+    return _sort([_compact(item) for item in items])
+
+def _mark_fresh(region):
+    with _cache_lock:
+        _stale.discard(region)
+
+def rebuild(regions):
+    """Recompute the given regions from the notifications table."""
+    for region in set(regions):
+        _store(region, _build(region))
+        _mark_fresh(region)
+
+def rebuild_all():
+    """Recompute every region in one pass over the active notifications."""
+    by_region = {}
+    items = scan_all(
+        notifications_table,
+        FilterExpression=Attr('is_active').eq(True),
+        ConsistentRead=True,
+        **projection(*SNAPSHOT_FIELDS)
+    )
+    for item in items:
+        for region in item.get("affected_regions", []):
+            by_region.setdefault(region, []).append(_compact(item))
+    # Regions whose last notification went away still need an empty snapshot
+    for item in scan_all(region_snapshots_table, ConsistentRead=True, **projection("region")):
+        by_region.setdefault(item["region"], [])
+    for region, notifications in by_region.items():
+        _store(region, _sort(notifications))
+        _mark_fresh(region)
+    return sorted(by_region)
+
+def apply_change(before=None, after=None):
+    """
+    Patch the snapshots of every region touched by a notification write.
+    `before` is the stored item prior to the write (None on create) and
+    `after` the item afterwards (None on delete).
+
+    Called once the notification is already stored, so failures are logged
+    rather than raised (a 500 would make admins retry and duplicate it). The
+    affected regions are rebuilt from the table on their next read instead.
+    """
+    regions = set((before or {}).get("affected_regions", [])) | set((after or {}).get("affected_regions", []))
+    try:
+        _patch(regions, before, after)
+    except Exception as e:
+        print(f"Region snapshot update failed for {sorted(regions)}, rebuilding on next read: {e}")
+        with _cache_lock:
+            _stale.update(regions)
+            for region in regions:
+                _cache.pop(region, None)
+
+def _patch(regions, before, after):
+    notification_id = (after or before)["notification_id"]
+    for region in regions:
+        for _ in range(MAX_PATCH_ATTEMPTS):
+            response = region_snapshots_table.get_item(Key={"region": region}, ConsistentRead=True)
+            current = response.get("Item")
+            if current is None:
+                # Never built (e.g. first write since deploy): build it from the table
+                rebuild([region])
+                break
+            notifications = [n for n in json.loads(current["payload"]) if n["notification_id"] != notification_id]
+            if after and after.get("is_active") and region in after.get("affected_regions", []):
+                notifications.append(_compact(after))
+            try:
+                _store(region, _sort(notifications), expected_version=int(current.get("version", 0)))
+                break
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+        else:
+            rebuild([region])
+
+def get(region):
+    """Active notifications for a region, most severe and newest first."""
+    with _cache_lock:
+        cached = _cache.get(region)
+        stale = region in _stale
+    if stale:
+        try:
+            rebuild([region])
+            with _cache_lock:
+                return _cache[region][1]
+        except Exception as e:
+            # Serve the last stored snapshot and try again on the next read
+            print(f"Region snapshot rebuild for {region} failed: {e}")
+    elif cached and time.monotonic() - cached[0] < CACHE_TTL:
+        return cached[1]
+    item = region_snapshots_table.get_item(Key={"region": region}, **projection("payload")).get("Item")
+    # Every region with an active notification has a snapshot (rebuild_all runs
+    # at startup and writes keep them patched), so a miss means nothing applies.
+    # Never fall back to scanning: the region comes straight from the query string.
+    notifications = json.loads(item["payload"]) if item is not None else []
+    _remember(region, notifications)
+    return notifications
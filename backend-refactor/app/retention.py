@@ -0,0 +1,192 @@
+"""
+Retention policy for the Requests and FloodNotifications tables.
+
+Items that reach a terminal state (resolved/cancelled requests, inactive
+notifications) get an `expires_at` TTL attribute. The archival job moves such
+items out of the hot table ARCHIVE_AFTER after they entered that state,
+writing gzip NDJSON objects to S3 under archive/<table>/<YYYY-MM>/ by creation
+month. Selection is keyed off expires_at itself rather than updated_at, so
+later edits (an admin note on a resolved request) cannot push archiving past
+the TTL; DynamoDB only deletes items the job somehow missed.
+
+The app runs the job every RETENTION_INTERVAL_HOURS from a background thread
+(started in the lifespan, like the ingest flusher). Worker processes on a host
+share a lease in the ingest queue file, so only one of them runs it; with
+several hosts, disable it (set 0) on all but one, or schedule the job
+externally instead:
+
+    python -m app.retention        # run the archival job once (e.g. from cron)
+"""
+
+import gzip, json, os, tempfile, threading, time
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import ClientError
+from app.db import requests_table, notifications_table, s3, BUCKET, scan_all, json_default
+from app import bulk, changefeed, ingest
+
+ARCHIVE_AFTER = timedelta(days=int(os.getenv("RETENTION_ARCHIVE_AFTER_DAYS", "30")))
+TTL_AFTER = timedelta(days=int(os.getenv("RETENTION_TTL_DAYS", "90")))
+ARCHIVE_PREFIX = "archive"
+TERMINAL_REQUEST_STATUSES = ("resolved", "cancelled")
+RUN_INTERVAL = float(os.getenv("RETENTION_INTERVAL_HOURS", "6")) * 3600
+# How often workers without the lease check whether its holder went away
+LEASE_POLL = 300.0
+
+POLICIES = {
+    "Requests": {
+        "table": requests_table,
+        "key": "request_id",
+        "entity": "requests",
+        "terminal": lambda: Attr("status").is_in(list(TERMINAL_REQUEST_STATUSES))
+    },
+    "FloodNotifications": {
+        "table": notifications_table,
+        "key": "notification_id",
+        "entity": "notifications",
+        "terminal": lambda: Attr("is_active").eq(False)
+    },
+}
+
+def ttl_timestamp():
+    """Epoch seconds for the expires_at attribute of an item entering a terminal state."""
+    return int(time.time() + TTL_AFTER.total_seconds())
+
+def _expired(policy, now):
+    # expires_at = terminal time + TTL_AFTER, so this is "terminal for at least
+    # ARCHIVE_AFTER". Items from before expires_at existed fall back to updated_at.
+    threshold = int(now.replace(tzinfo=timezone.utc).timestamp() + (TTL_AFTER - ARCHIVE_AFTER).total_seconds())
+    cutoff = (now - ARCHIVE_AFTER).isoformat()
+    legacy = policy["terminal"]() & Attr("expires_at").not_exists() & Attr("updated_at").lt(cutoff)
+    return Attr("expires_at").lt(threshold) | legacy
+
+def _month(item):
+    created_at = item.get("created_at") or ""
+    return created_at[:7] if len(created_at) >= 7 else "unknown"
+
+def _rewrite_archive(source, object_key, key, keep_ids):
+    if not keep_ids:
+        s3.delete_object(Bucket=BUCKET, Key=object_key)
+        return
+    source.seek(0)
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as filtered:
+        with gzip.GzipFile(fileobj=filtered, mode="wb") as writer:
+            with gzip.GzipFile(fileobj=source, mode="rb") as reader:
+                for line in reader:
+                    if json.loads(line)[key] in keep_ids:
+                        writer.write(line)
+        filtered.seek(0)
+        s3.upload_fileobj(filtered, BUCKET, object_key, ExtraArgs={"ContentType": "application/gzip"})
+
+def archive_table(name, now=None):
+    """Archive and remove one table's expired items. Returns the number moved."""
+    policy = POLICIES[name]
+    table, key = policy["table"], policy["key"]
+    now = now or datetime.utcnow()
+    run_id = uuid4().hex
+
+    # One spooled gzip stream per month keeps memory flat on large backlogs
+    files, writers, archived = {}, {}, {}
+    try:
+        for item in scan_all(table, FilterExpression=_expired(policy, now)):
+            month = _month(item)
+            if month not in writers:
+                files[month] = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+                writers[month] = gzip.GzipFile(fileobj=files[month], mode="wb")
+            writers[month].write((json.dumps(item, default=json_default, separators=(",", ":")) + "\n").encode("utf-8"))
+            archived.setdefault(month, []).append((item[key], item.get("updated_at")))
+
+        moved = 0
+        for month, entries in archived.items():
+            object_key = f"{ARCHIVE_PREFIX}/{name}/{month}/{run_id}.ndjson.gz"
+            writers[month].close()
+            files[month].seek(0)
+            s3.upload_fileobj(files[month], BUCKET, object_key, ExtraArgs={"ContentType": "application/gzip"})
+            # Only delete once the archive object exists, and only if nobody
+            # touched the item since it was read (e.g. a request was reopened).
+            deleted, error = [], None
+            for item_id, updated_at in entries:
+                try:
+                    table.delete_item(
+                        Key={key: item_id},
+                        ConditionExpression=Attr("updated_at").eq(updated_at)
+                    )
+                    deleted.append(item_id)
+                except ClientError as e:
+                    if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                        error = e
+                        break
+            if len(deleted) < len(entries):
+                # Items still in the table get archived again by a later run,
+                # so this object must only hold the ones that actually left.
+                _rewrite_archive(files[month], object_key, key, set(deleted))
+            if deleted:
+                changefeed.record_many(policy["entity"], deleted, "delete")
+            moved += len(deleted)
+            if error is not None:
+                raise error
+        return moved
+    finally:
+        for month, file in files.items():
+            if not writers[month].closed:
+                writers[month].close()
+            file.close()
+
+def run_archival(now=None):
+    return {name: archive_table(name, now) for name in POLICIES}
+
+_stop = threading.Event()
+_thread = None
+_last_run = {"started_at": None, "finished_at": None, "archived": None, "error": None}
+
+def _run():
+    while not _stop.is_set():
+        if not ingest.acquire_lease("retention", RUN_INTERVAL):
+            _stop.wait(min(RUN_INTERVAL, LEASE_POLL))
+            continue
+        _last_run["started_at"] = time.time()
+        try:
+            _last_run["archived"] = run_archival()
+            _last_run["error"] = None
+        except Exception as e:
+            # Items stay in the table; the next run picks them up again
+            _last_run["error"] = str(e)
+            print(f"Retention archival failed: {e}")
+        _last_run["finished_at"] = time.time()
+        # Renew so the lease covers the wait until our next run
+        ingest.acquire_lease("retention", RUN_INTERVAL)
+        _stop.wait(RUN_INTERVAL)
+
+def start_scheduler():
+    global _thread
+    if RUN_INTERVAL <= 0 or (_thread is not None and _thread.is_alive()):
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_run, name="retention-archiver", daemon=True)
+    _thread.start()
+
+def stop_scheduler(timeout=10.0):
+    global _thread
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout)
+        _thread = None
+
+def metrics():
+    return dict(_last_run, interval_seconds=RUN_INTERVAL)
+
+def read_archive(name, month, item_id=None):
+    """Yield archived items of a table for one YYYY-MM month, optionally a single id."""
+    key = POLICIES[name]["key"]
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=BUCKET, Prefix=f"{ARCHIVE_PREFIX}/{name}/{month}/"):
+        for obj in page.get("Contents", []):
+            body = s3.get_object(Bucket=BUCKET, Key=obj["Key"])["Body"]
+            for item in bulk.read_ndjson_gz(body):
+                if item_id is None or item.get(key) == item_id:
+                    yield item
+
+if __name__ == "__main__":
+    print(json.dumps(run_archival()))
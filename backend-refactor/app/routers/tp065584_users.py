@@ -3,20 +3,27 @@ Author: ABDUZAFAR MADRAIMOV (TP065584)
 """
 
 from fastapi import APIRouter, Form, UploadFile, File, HTTPException, Query
-from app.db import users_table, requests_table, s3, BUCKET
+from app.db import users_table, requests_table, s3, BUCKET, projection, REQUEST_SUMMARY_FIELDS
+from app import changefeed, ingest
 from uuid import uuid4
+from typing import Literal
 
 router = APIRouter()
 
 @router.get("/user-requests")
-def get_user_requests(email: str = Query(...)):
+def get_user_requests(email: str = Query(...), view: Literal["summary", "detail"] = Query("detail")):
     try:
-        response = requests_table.scan()
+        scan_params = projection(*REQUEST_SUMMARY_FIELDS) if view == "summary" else {}
+        response = requests_table.scan(**scan_params)
         all_items = response.get("Items", [])
 
         # Filter by email
         user_items = [item for item in all_items if item.get("user_email") == email]
 
+        # Include submissions still waiting in the ingest queue
+        seen = {item["request_id"] for item in user_items}
+        user_items += [item for item in ingest.pending_for(email) if item["request_id"] not in seen]
+
         return user_items
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -31,7 +38,7 @@ async def update_user_profile(
 ):
     try:
         # Fetch current user by user_id
-        response = users_table.get_item(Key={"user_id": user_id})
+        response = users_table.get_item(Key={"user_id": user_id}, **projection("email", "S3_Key"))
         user = response.get("Item")
         if not user:
             raise HTTPException(status_code=404, detail="User not found.")
@@ -40,7 +47,8 @@ async def update_user_profile(
         if email != user["email"]:
             existing = users_table.scan(
                 FilterExpression="email = :email",
-                ExpressionAttributeValues={":email": email}
+                ExpressionAttributeValues={":email": email},
+                **projection("user_id")
             )
             if existing.get("Items"):
                 raise HTTPException(status_code=400, detail="Email already in use by another account.")
@@ -78,8 +86,9 @@ async def update_user_profile(
             UpdateExpression=update_expr,
             ExpressionAttributeValues=expr_values
         )
+        changefeed.record("users", user_id)
 
-        updated_response = users_table.get_item(Key={"user_id": user_id})
+        updated_response = users_table.get_item(Key={"user_id": user_id}, **projection("username", "email", "S3_URL"))
         updated_user = updated_response.get("Item", {})
         
         return {
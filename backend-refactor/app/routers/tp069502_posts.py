@@ -1,10 +1,20 @@
 
-from fastapi import APIRouter, Form, UploadFile, File, HTTPException, Query, Path, Body
-from app.db import posts_table, requests_table, s3, BUCKET
+from fastapi import APIRouter, Form, UploadFile, File, HTTPException, Query, Path, Body, Header
+from app.db import posts_table, s3, BUCKET, projection, POST_SUMMARY_FIELDS
+from app import ingest, singleflight
 from uuid import uuid4
 from datetime import datetime
+from typing import Literal
 
 router = APIRouter()
+post_reads = singleflight.group("posts")
+
+async def scan_posts(view):
+    # Concurrent feed loads share one in-flight scan; the list is shared too,
+    # so callers must build new lists rather than sort/filter in place.
+    # Async so waiting callers sit on the event loop, not on threadpool threads.
+    scan_params = projection(*POST_SUMMARY_FIELDS) if view == "summary" else {}
+    return await post_reads.do_async(("scan", view), lambda: posts_table.scan(**scan_params).get("Items", []))
 
 @router.post("/create-post")
 async def create_post(
@@ -40,10 +50,9 @@ async def create_post(
 
 
 @router.get("/posts")
-def get_posts():
+async def get_posts(view: Literal["summary", "detail"] = Query("detail")):
     try:
-        response = posts_table.scan()
-        items = response.get("Items", [])
+        items = await scan_posts(view)
 
         # Sort items by Post_CreateDate descending (newest first)
         sorted_items = sorted(
@@ -58,17 +67,16 @@ def get_posts():
 
 
 @router.get("/org-posts")
-def get_posts(organization: str = Query(None)):
+async def get_posts(organization: str = Query(None), view: Literal["summary", "detail"] = Query("detail")):
     try:
-        response = posts_table.scan()
-        items = response.get("Items", [])
+        items = await scan_posts(view)
 
         # If query param provided, filter it
         if organization:
             items = [item for item in items if item.get("Post_Organization") == organization]
 
         # Sort newest to oldest
-        items.sort(key=lambda x: x.get("Post_CreateDate", ""), reverse=True)
+        items = sorted(items, key=lambda x: x.get("Post_CreateDate", ""), reverse=True)
 
         return items
     except Exception as e:
@@ -119,19 +127,21 @@ def delete_post(post_id: str, s3key: str = Query(None)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/submit-request")
+@router.post("/submit-request", status_code=202)
 def submit_request(
     user_email: str = Form(...),
     user_name: str = Form(...),
     req_type: str = Form(...),
     req_details: str = Form(...),
-    req_region: str = Form(...)
+    req_region: str = Form(...),
+    idempotency_key: str = Header(None, alias="Idempotency-Key")
 ):
     try:
         timestamp = datetime.utcnow().isoformat()
-        request_id = str(uuid4())
+        request_id = ingest.new_request_id(user_email, idempotency_key)
 
-        requests_table.put_item(Item={
+        # Queued locally and written to DynamoDB in batches by the flusher
+        ingest.enqueue({
             "request_id": request_id,
             "user_email": user_email,
             "user_name": user_name,
@@ -139,8 +149,12 @@ def submit_request(
             "req_details": req_details,
             "req_region": req_region,
             "created_at": timestamp
-        })
+        }, keyed=bool(idempotency_key))
 
-        return {"message": "Request submitted successfully!"}
+        return {"message": "Request submitted successfully!", "request_id": request_id}
+    except ingest.InvalidItem as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except ingest.QueueFull:
+        raise HTTPException(status_code=503, detail="Too many pending requests, please retry shortly.", headers={"Retry-After": "5"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
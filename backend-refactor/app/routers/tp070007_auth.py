@@ -4,7 +4,8 @@ Author: AHMED MOHAMED AHMED ABDELGADIR (TP070007)
 
 from fastapi import APIRouter, Form, HTTPException, status
 from fastapi.responses import JSONResponse
-from app.db import users_table
+from app.db import users_table, projection
+from app import changefeed
 from werkzeug.security import generate_password_hash, check_password_hash
 from uuid import uuid4
 
@@ -22,7 +23,8 @@ def register_user(
         # Scan to check if email already exists
         response = users_table.scan(
             FilterExpression="email = :email",
-            ExpressionAttributeValues={":email": email}
+            ExpressionAttributeValues={":email": email},
+            **projection("user_id")
         )
         if response.get("Items"):
             return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"error": "Email already registered."})
@@ -41,6 +43,7 @@ def register_user(
             "S3_URL": None,
             "S3_Key": None
         })
+        changefeed.record("users", user_id)
 
         return JSONResponse(status_code=status.HTTP_201_CREATED, content={"message": "Registration successful!"})
 
@@ -58,7 +61,8 @@ def login_user(
         # Scan to find user by email
         response = users_table.scan(
             FilterExpression="email = :email",
-            ExpressionAttributeValues={":email": email}
+            ExpressionAttributeValues={":email": email},
+            **projection("user_id", "email", "username", "password", "role", "S3_URL")
         )
         items = response.get("Items", [])
         if not items:
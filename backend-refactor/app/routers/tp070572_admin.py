@@ -1,16 +1,20 @@
 
 import secrets
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Literal, Optional
 from uuid import uuid4
 
 from werkzeug.security import generate_password_hash, check_password_hash
 from boto3.dynamodb.conditions import Attr
-from fastapi import APIRouter, HTTPException, Query, Path, Body, Depends
-from app.db import notifications_table, users_table, requests_table, posts_table, announcements_table
+from fastapi import APIRouter, HTTPException, Query, Path, Body, Depends, UploadFile, File
+from fastapi.responses import StreamingResponse
+from app.db import notifications_table, users_table, requests_table, posts_table, announcements_table, projection
+from app.db import USER_PUBLIC_FIELDS, REQUEST_SUMMARY_FIELDS, NOTIFICATION_SUMMARY_FIELDS, ANNOUNCEMENT_SUMMARY_FIELDS
 from app.models.schemas import FloodNotificationCreate, FloodNotificationUpdate
+from app import bulk, changefeed, ingest, ratelimit, region_snapshots, retention, singleflight
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
+public_notification_reads = singleflight.group("public_notifications")
 admin_sessions = {}
 
 def hash_password(password: str) -> str:
@@ -45,15 +49,36 @@ async def create_flood_notification(notification: FloodNotificationCreate, _: st
         "created_at": timestamp,
         "updated_at": timestamp
     }
+    if not notification.is_active:
+        item["expires_at"] = retention.ttl_timestamp()
     notifications_table.put_item(Item=item)
+    region_snapshots.apply_change(after=item)
+    changefeed.record("notifications", notification_id)
     return {"notification_id": notification_id, "data": item}
 
 @router.get("/notifications")
-async def get_flood_notifications(active_only: bool = Query(False), _: str = Depends(verify_admin)):
+async def get_flood_notifications(
+    active_only: bool = Query(False),
+    severity: Optional[str] = Query(None),
+    region: Optional[str] = Query(None),
+    view: Literal["summary", "detail"] = Query("detail"),
+    _: str = Depends(verify_admin)
+):
+    scan_params = projection(*NOTIFICATION_SUMMARY_FIELDS) if view == "summary" else {}
+    # Same filters the dashboard applies to change-feed deltas
+    conditions = []
     if active_only:
-        response = notifications_table.scan(FilterExpression=Attr('is_active').eq(True))
-    else:
-        response = notifications_table.scan()
+        conditions.append(Attr('is_active').eq(True))
+    if severity:
+        conditions.append(Attr('severity').eq(severity))
+    if region:
+        conditions.append(Attr('affected_regions').contains(region))
+    if conditions:
+        filter_expression = conditions[0]
+        for condition in conditions[1:]:
+            filter_expression = filter_expression & condition
+        scan_params["FilterExpression"] = filter_expression
+    response = notifications_table.scan(**scan_params)
     notifications = response.get("Items", [])
     notifications.sort(key=lambda x: x.get('created_at', ''), reverse=True)
     return {"count": len(notifications), "notifications": notifications}
@@ -61,7 +86,7 @@ async def get_flood_notifications(active_only: bool = Query(False), _: str = Dep
 
 @router.put("/notifications/{notification_id}")
 async def update_flood_notification(notification_id: str = Path(...), notification_update: FloodNotificationUpdate = Body(...), _: str = Depends(verify_admin)):
-    response = notifications_table.get_item(Key={"notification_id": notification_id})
+    response = notifications_table.get_item(Key={"notification_id": notification_id}, ConsistentRead=True, **projection("notification_id", "affected_regions"))
     if "Item" not in response:
         raise HTTPException(status_code=404, detail="Notification not found")
     
@@ -83,23 +108,49 @@ async def update_flood_notification(notification_id: str = Path(...), notificati
     if notification_update.is_active is not None:
         update_expression += ", is_active = :active"
         expression_values[":active"] = notification_update.is_active
-    
-    notifications_table.update_item(
+        if notification_update.is_active:
+            update_expression += " REMOVE expires_at"
+        else:
+            update_expression += ", expires_at = :expires"
+            expression_values[":expires"] = retention.ttl_timestamp()
+    
+    # ALL_NEW hands back the item as written; a follow-up get_item could still
+    # return the old version and patch it into the snapshots
+    updated = notifications_table.update_item(
         Key={"notification_id": notification_id},
         UpdateExpression=update_expression,
-        ExpressionAttributeValues=expression_values
-    )
-    updated_response = notifications_table.get_item(Key={"notification_id": notification_id})
-    return {"data": updated_response["Item"]}
+        ExpressionAttributeValues=expression_values,
+        ReturnValues="ALL_NEW"
+    )["Attributes"]
+    region_snapshots.apply_change(before=response["Item"], after=updated)
+    changefeed.record("notifications", notification_id)
+    return {"data": updated}
 
 @router.delete("/notifications/{notification_id}")
 async def delete_flood_notification(notification_id: str = Path(...), _: str = Depends(verify_admin)):
-    response = notifications_table.get_item(Key={"notification_id": notification_id})
+    response = notifications_table.get_item(Key={"notification_id": notification_id}, ConsistentRead=True, **projection("notification_id", "affected_regions"))
     if "Item" not in response:
         raise HTTPException(status_code=404, detail="Notification not found")
     notifications_table.delete_item(Key={"notification_id": notification_id})
+    region_snapshots.apply_change(before=response["Item"])
+    changefeed.record("notifications", notification_id, "delete")
     return {"success": True}
 
+@router.post("/notifications/snapshots/rebuild")
+async def rebuild_region_snapshots(_: str = Depends(verify_admin)):
+    regions = region_snapshots.rebuild_all()
+    return {"success": True, "regions": regions}
+
+
+@router.get("/changes/{entity}")
+async def get_changes(entity: str = Path(...), updated_since: Optional[str] = Query(None), _: str = Depends(verify_admin)):
+    if entity not in changefeed.ENTITIES:
+        raise HTTPException(status_code=404, detail="Unknown entity")
+    try:
+        return changefeed.changes_since(entity, updated_since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid updated_since cursor")
+
 
 @router.get("/dashboard/stats")
 async def get_dashboard_stats(_: str = Depends(verify_admin)):
@@ -111,18 +162,36 @@ async def get_dashboard_stats(_: str = Depends(verify_admin)):
     }
     return {"dashboard_stats": stats, "last_updated": datetime.utcnow().isoformat()}
 
+@router.get("/metrics")
+async def get_metrics(_: str = Depends(verify_admin)):
+    return {
+        "ingest": ingest.metrics(),
+        "rate_limit": ratelimit.metrics(),
+        "singleflight": singleflight.metrics(),
+        "retention": retention.metrics()
+    }
+
 @router.get("/public/notifications")
-async def get_public_notifications(region: Optional[str] = Query(None), severity: Optional[str] = Query(None)):
-    response = notifications_table.scan(FilterExpression=Attr('is_active').eq(True))
-    notifications = response.get("Items", [])
-    
+async def get_public_notifications(region: Optional[str] = Query(None), severity: Optional[str] = Query(None), view: Literal["summary", "detail"] = Query("detail")):
+    # Identical concurrent reads share one backend call and its (read-only) result
     if region:
-        notifications = [n for n in notifications if region in n.get('affected_regions', [])]
+        # One keyed read of the precomputed regional snapshot instead of a
+        # scan; snapshots are already sorted and shared, so never mutate them
+        notifications = await public_notification_reads.do_async(("region", region), lambda: region_snapshots.get(region))
+        if view == "summary":
+            notifications = [{k: n[k] for k in NOTIFICATION_SUMMARY_FIELDS if k in n} for n in notifications]
+    else:
+        scan_params = projection(*NOTIFICATION_SUMMARY_FIELDS) if view == "summary" else {}
+        scanned = await public_notification_reads.do_async(
+            ("scan", view),
+            lambda: notifications_table.scan(FilterExpression=Attr('is_active').eq(True), **scan_params).get("Items", [])
+        )
+        severity_order = {"critical": 4, "high": 3, "medium": 2, "low": 1}
+        notifications = sorted(scanned, key=lambda x: (severity_order.get(x.get('severity', 'low'), 0), x.get('created_at', '')), reverse=True)
+    
     if severity:
         notifications = [n for n in notifications if n.get('severity') == severity]
     
-    severity_order = {"critical": 4, "high": 3, "medium": 2, "low": 1}
-    notifications.sort(key=lambda x: (severity_order.get(x.get('severity', 'low'), 0), x.get('created_at', '')), reverse=True)
     return {"count": len(notifications), "notifications": notifications}
 
 @router.post("/create-admin-user")
@@ -135,7 +204,7 @@ async def create_admin_user(admin_data: dict = Body(...)):
     if len(admin_data["password"]) < 8:
         raise HTTPException(status_code=400, detail="Password too short")
     
-    existing_check = users_table.scan(FilterExpression=Attr('username').eq(admin_data["username"]) | Attr('email').eq(admin_data["email"]))
+    existing_check = users_table.scan(FilterExpression=Attr('username').eq(admin_data["username"]) | Attr('email').eq(admin_data["email"]), **projection("user_id"))
     if existing_check.get("Items"):
         raise HTTPException(status_code=400, detail="User already exists")
     
@@ -150,6 +219,7 @@ async def create_admin_user(admin_data: dict = Body(...)):
         "S3_Key": None
     }
     users_table.put_item(Item=admin_item)
+    changefeed.record("users", admin_id)
     return {"admin_id": admin_id, "username": admin_data["username"]}
 
 @router.post("/admin-login")
@@ -160,7 +230,7 @@ async def admin_login(credentials: dict = Body(...)):
     if not username or not password:
         raise HTTPException(status_code=400, detail="Username and password required")
     
-    response = users_table.scan(FilterExpression=Attr('username').eq(username) & Attr('role').eq('admin'))
+    response = users_table.scan(FilterExpression=Attr('username').eq(username) & Attr('role').eq('admin'), **projection("user_id", "username", "password"))
     admin_users = response.get("Items", [])
     
     if not admin_users or not verify_password(password, admin_users[0].get("password", "")):
@@ -184,7 +254,8 @@ async def admin_login(credentials: dict = Body(...)):
 
 @router.get("/users/all")
 async def get_all_users(search: Optional[str] = Query(None), role: Optional[str] = Query(None), limit: int = Query(100), _: str = Depends(verify_admin)):
-    scan_params = {"Limit": limit}
+    # Password hashes are never read, so nothing has to be stripped afterwards
+    scan_params = {"Limit": limit, **projection(*USER_PUBLIC_FIELDS)}
     if role:
         scan_params["FilterExpression"] = Attr('role').eq(role)
     
@@ -195,10 +266,6 @@ async def get_all_users(search: Optional[str] = Query(None), role: Optional[str]
         search_lower = search.lower()
         users = [u for u in users if (search_lower in u.get('full_name', '').lower() or search_lower in u.get('email', '').lower() or search_lower in u.get('username', '').lower())]
     
-    for user in users:
-        user.pop('password_hash', None)
-        user.pop('password', None)
-    
     users.sort(key=lambda x: x.get('created_at', ''), reverse=True)
     return {"count": len(users), "users": users}
 
@@ -209,7 +276,7 @@ async def reset_user_password(user_id: str = Path(...), password_data: dict = Bo
     if not new_password or len(new_password) < 8:
         raise HTTPException(status_code=400, detail="Password too short")
     
-    response = users_table.get_item(Key={"user_id": user_id})
+    response = users_table.get_item(Key={"user_id": user_id}, **projection("user_id"))
     if "Item" not in response:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -224,7 +291,7 @@ async def reset_user_password(user_id: str = Path(...), password_data: dict = Bo
 
 @router.put("/users/{user_id}/profile")
 async def update_user_profile(user_id: str = Path(...), profile_data: dict = Body(...), _: str = Depends(verify_admin)):
-    response = users_table.get_item(Key={"user_id": user_id})
+    response = users_table.get_item(Key={"user_id": user_id}, **projection("user_id"))
     if "Item" not in response:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -248,12 +315,13 @@ async def update_user_profile(user_id: str = Path(...), profile_data: dict = Bod
         UpdateExpression=update_expression,
         ExpressionAttributeValues=expression_values
     )
+    changefeed.record("users", user_id)
     return {"success": True}
 
 
 @router.delete("/users/{user_id}")
 async def delete_user(user_id: str = Path(...), _: str = Depends(verify_admin)):
-    response = users_table.get_item(Key={"user_id": user_id})
+    response = users_table.get_item(Key={"user_id": user_id}, **projection("user_id", "role"))
     if "Item" not in response:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -261,10 +329,15 @@ async def delete_user(user_id: str = Path(...), _: str = Depends(verify_admin)):
         raise HTTPException(status_code=403, detail="Cannot delete admin")
     
     users_table.delete_item(Key={"user_id": user_id})
+    changefeed.record("users", user_id, "delete")
     return {"success": True}
 @router.get("/requests/all")
-async def get_all_requests(status: Optional[str] = Query(None), region: Optional[str] = Query(None), search: Optional[str] = Query(None), limit: int = Query(100), _: str = Depends(verify_admin)):
-    response = requests_table.scan(Limit=limit)
+async def get_all_requests(status: Optional[str] = Query(None), region: Optional[str] = Query(None), search: Optional[str] = Query(None), limit: int = Query(100), view: Literal["summary", "detail"] = Query("detail"), _: str = Depends(verify_admin)):
+    scan_params = {"Limit": limit}
+    if view == "summary":
+        # search also matches on req_details, so keep it in that case
+        scan_params.update(projection(*REQUEST_SUMMARY_FIELDS, *(("req_details",) if search else ())))
+    response = requests_table.scan(**scan_params)
     requests = response.get("Items", [])
     
     if status:
@@ -286,7 +359,7 @@ async def update_request_status(request_id: str = Path(...), status_data: dict =
     if new_status not in ["pending", "in_progress", "resolved", "cancelled"]:
         raise HTTPException(status_code=400, detail="Invalid status")
     
-    response = requests_table.get_item(Key={"request_id": request_id})
+    response = requests_table.get_item(Key={"request_id": request_id}, **projection("request_id"))
     if "Item" not in response:
         raise HTTPException(status_code=404, detail="Request not found")
     
@@ -298,12 +371,20 @@ async def update_request_status(request_id: str = Path(...), status_data: dict =
         update_expression += ", admin_note = :note"
         expression_values[":note"] = admin_note
     
+    # Terminal requests age out of the hot table; reopening one keeps it
+    if new_status in retention.TERMINAL_REQUEST_STATUSES:
+        update_expression += ", expires_at = :expires"
+        expression_values[":expires"] = retention.ttl_timestamp()
+    else:
+        update_expression += " REMOVE expires_at"
+    
     requests_table.update_item(
         Key={"request_id": request_id},
         UpdateExpression=update_expression,
         ExpressionAttributeValues=expression_values,
         ExpressionAttributeNames=expression_names
     )
+    changefeed.record("requests", request_id)
     return {"success": True, "new_status": new_status}
 
 
@@ -314,26 +395,27 @@ async def add_admin_note_to_request(request_id: str = Path(...), note_data: dict
     if not note:
         raise HTTPException(status_code=400, detail="Note required")
     
-    response = requests_table.get_item(Key={"request_id": request_id})
+    response = requests_table.get_item(Key={"request_id": request_id}, **projection("request_id"))
     if "Item" not in response:
         raise HTTPException(status_code=404, detail="Request not found")
     
-    admin_notes = response["Item"].get("admin_notes", [])
     new_note = {
         "note_id": str(uuid4()),
         "note": note,
         "created_at": datetime.utcnow().isoformat()
     }
-    admin_notes.append(new_note)
     
+    # Append server-side so the growing notes list never has to be read back
     requests_table.update_item(
         Key={"request_id": request_id},
-        UpdateExpression="SET admin_notes = :notes, updated_at = :timestamp",
+        UpdateExpression="SET admin_notes = list_append(if_not_exists(admin_notes, :empty), :notes), updated_at = :timestamp",
         ExpressionAttributeValues={
-            ":notes": admin_notes,
+            ":notes": [new_note],
+            ":empty": [],
             ":timestamp": datetime.utcnow().isoformat()
         }
     )
+    changefeed.record("requests", request_id)
     return {"note": new_note}
 @router.post("/announcements")
 async def create_announcement(announcement_data: dict = Body(...), _: str = Depends(verify_admin)):
@@ -348,19 +430,21 @@ async def create_announcement(announcement_data: dict = Body(...), _: str = Depe
         "updated_at": timestamp
     }
     announcements_table.put_item(Item=item)
+    changefeed.record("announcements", announcement_id)
     return {"announcement_id": announcement_id, "data": item}
 
 @router.get("/announcements")
-async def get_announcements(active_only: bool = Query(True), _: str = Depends(verify_admin)):
+async def get_announcements(active_only: bool = Query(True), view: Literal["summary", "detail"] = Query("detail"), _: str = Depends(verify_admin)):
     filter_expr = Attr('is_active').eq(True) if active_only else None
-    response = announcements_table.scan(**({"FilterExpression": filter_expr} if filter_expr else {}))
+    scan_params = projection(*ANNOUNCEMENT_SUMMARY_FIELDS) if view == "summary" else {}
+    response = announcements_table.scan(**({"FilterExpression": filter_expr} if filter_expr else {}), **scan_params)
     announcements = response.get("Items", [])
     announcements.sort(key=lambda x: x.get('created_at', ''), reverse=True)
     return {"count": len(announcements), "announcements": announcements}
 
 @router.put("/announcements/{announcement_id}")
 async def update_announcement(announcement_id: str = Path(...), update_data: dict = Body(...), _: str = Depends(verify_admin)):
-    response = announcements_table.get_item(Key={"announcement_id": announcement_id})
+    response = announcements_table.get_item(Key={"announcement_id": announcement_id}, **projection("announcement_id"))
     if "Item" not in response:
         raise HTTPException(status_code=404, detail="Announcement not found")
     
@@ -377,16 +461,64 @@ async def update_announcement(announcement_id: str = Path(...), update_data: dic
         UpdateExpression=update_expression,
         ExpressionAttributeValues=expression_values
     )
+    changefeed.record("announcements", announcement_id)
     return {"success": True}
 
 @router.delete("/announcements/{announcement_id}")
 async def delete_announcement(announcement_id: str = Path(...), _: str = Depends(verify_admin)):
     announcements_table.delete_item(Key={"announcement_id": announcement_id})
+    changefeed.record("announcements", announcement_id, "delete")
     return {"success": True}
 
+@router.get("/export/{table_name}")
+def export_table(table_name: str = Path(...), format: Literal["ndjson", "parquet"] = Query("ndjson"), segments: int = Query(bulk.DEFAULT_SEGMENTS, ge=1, le=16), _: str = Depends(verify_admin)):
+    if table_name not in bulk.EXPORT_TABLES:
+        raise HTTPException(status_code=404, detail="Unknown table")
+    if format == "parquet" and bulk.pa is None:
+        raise HTTPException(status_code=501, detail="Parquet export is not available on this server")
+    
+    filename = f"{table_name}.parquet" if format == "parquet" else f"{table_name}.ndjson.gz"
+    media_type = "application/vnd.apache.parquet" if format == "parquet" else "application/gzip"
+    return StreamingResponse(
+        bulk.export_chunks(table_name, format, segments),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.post("/import/{table_name}")
+def import_table(table_name: str = Path(...), file: UploadFile = File(...), _: str = Depends(verify_admin)):
+    if table_name not in bulk.EXPORT_TABLES:
+        raise HTTPException(status_code=404, detail="Unknown table")
+    
+    try:
+        count = bulk.import_items(table_name, bulk.read_ndjson_gz(file.file))
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid gzip NDJSON upload: {e}")
+    if table_name == "FloodNotifications":
+        region_snapshots.rebuild_all()
+    return {"success": True, "imported": count}
+
+@router.post("/retention/run")
+def run_retention(_: str = Depends(verify_admin)):
+    return {"success": True, "archived": retention.run_archival()}
+
+@router.get("/archive/{table_name}")
+def get_archived_items(table_name: str = Path(...), month: str = Query(..., pattern=r"^\d{4}-\d{2}$"), item_id: Optional[str] = Query(None), limit: int = Query(1000, ge=1, le=10000), _: str = Depends(verify_admin)):
+    if table_name not in retention.POLICIES:
+        raise HTTPException(status_code=404, detail="Unknown table")
+    
+    items = []
+    for item in retention.read_archive(table_name, month, item_id):
+        items.append(item)
+        if len(items) >= limit:
+            break
+    items.sort(key=lambda x: x.get('created_at', ''), reverse=True)
+    return {"count": len(items), "items": items}
+
 @router.get("/public/announcements")
-async def get_public_announcements():
-    response = announcements_table.scan(FilterExpression=Attr('is_active').eq(True))
+async def get_public_announcements(view: Literal["summary", "detail"] = Query("detail")):
+    scan_params = projection(*ANNOUNCEMENT_SUMMARY_FIELDS) if view == "summary" else {}
+    response = announcements_table.scan(FilterExpression=Attr('is_active').eq(True), **scan_params)
     announcements = response.get("Items", [])
     announcements.sort(key=lambda x: x.get('created_at', ''), reverse=True)
     return {"count": len(announcements), "announcements": announcements}
\ No newline at end of file
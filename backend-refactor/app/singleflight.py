@@ -0,0 +1,82 @@
+"""
+Single-flight coalescing of identical concurrent reads.
+
+While a read for a key is in flight, further callers asking for the same key
+wait for that call and share its result instead of issuing their own DynamoDB
+request. Nothing is cached afterwards, so the next read after completion goes
+to the backend again. Results are shared objects: callers must not mutate them.
+"""
+
+import asyncio, threading
+from starlette.concurrency import run_in_threadpool
+
+_groups = {}
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.async_calls = {}
+        self.counters = {"calls": 0, "executions": 0, "coalesced": 0}
+
+    def _count(self, leader):
+        self.counters["calls"] += 1
+        self.counters["executions" if leader else "coalesced"] += 1
+
+    def do(self, key, fn):
+        """Run blocking fn() once per key across concurrent threads."""
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+            self._count(leader)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result
+
+    async def do_async(self, key, fn):
+        """Async variant: blocking fn() runs once in the threadpool per key."""
+        # Only ever touched from the event loop, so no lock is needed here
+        future = self.async_calls.get(key)
+        with self.lock:
+            self._count(future is None)
+        if future is None:
+            future = asyncio.ensure_future(run_in_threadpool(fn))
+            self.async_calls[key] = future
+            future.add_done_callback(lambda _: self.async_calls.pop(key, None))
+        # shield: one waiter disconnecting must not cancel the shared call
+        return await asyncio.shield(future)
+
+    def metrics(self):
+        with self.lock:
+            return dict(self.counters, in_flight=len(self.calls) + len(self.async_calls))
+
+def group(name):
+    if name not in _groups:
+        _groups[name] = SingleFlight(name)
+    return _groups[name]
+
+def metrics():
+    return {name: flight.metrics() for name, flight in _groups.items()}
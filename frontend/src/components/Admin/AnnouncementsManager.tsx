@@ -3,6 +3,7 @@ import React, { useState, useEffect } from 'react';
 import './AnnouncementsManager.css';
 import API_ENDPOINTS from '../../config/api';
 import useToast from '../../hooks/useToast';
+import useChangeFeed from '../../hooks/useChangeFeed';
 import ToastContainer from '../Toast/ToastContainer';
 
 interface Announcement {
@@ -33,6 +34,7 @@ const AnnouncementsManager: React.FC = () => {
   });
   const [activeOnly, setActiveOnly] = useState(true);
   const [adminKey] = useState(localStorage.getItem('admin_key') || '');
+  const changeFeed = useChangeFeed<Announcement>('announcements', 'announcement_id', setAnnouncements, adminKey);
   const { toasts, removeToast, showSuccess, showError } = useToast();
 
   const fetchAnnouncements = async () => {
@@ -40,6 +42,7 @@ const AnnouncementsManager: React.FC = () => {
 
     try {
       setLoading(true);
+      await changeFeed.reset();
       const url = `${API_ENDPOINTS.ADMIN_ANNOUNCEMENTS}?admin_key=${adminKey}&active_only=${activeOnly}`;
       
       const response = await fetch(url);
@@ -58,6 +61,10 @@ const AnnouncementsManager: React.FC = () => {
     }
   };
 
+  const refreshAnnouncements = async () => {
+    if (!(await changeFeed.sync(a => !activeOnly || a.is_active))) await fetchAnnouncements();
+  };
+
   const createAnnouncement = async () => {
     if (!adminKey) return;
 
@@ -72,7 +79,7 @@ const AnnouncementsManager: React.FC = () => {
 
       if (response.ok) {
         showSuccess('Announcement Created', 'Global announcement has been created successfully.');
-        await fetchAnnouncements();
+        await refreshAnnouncements();
         setShowCreateModal(false);
         resetForm();
       } else {
@@ -101,7 +108,7 @@ const AnnouncementsManager: React.FC = () => {
 
       if (response.ok) {
         showSuccess('Success', 'Announcement updated successfully');
-        await fetchAnnouncements();
+        await refreshAnnouncements();
         setEditingAnnouncement(null);
         resetForm();
       } else {
@@ -126,7 +133,7 @@ const AnnouncementsManager: React.FC = () => {
 
       if (response.ok) {
         showSuccess('Success', 'Announcement deleted successfully');
-        await fetchAnnouncements();
+        await refreshAnnouncements();
       } else {
         showError('Delete Failed', 'Unable to delete announcement');
       }
@@ -3,6 +3,7 @@ import React, { useState, useEffect } from 'react';
 import './NotificationsManager.css';
 import API_ENDPOINTS from '../../config/api';
 import useToast from '../../hooks/useToast';
+import useChangeFeed from '../../hooks/useChangeFeed';
 import ToastContainer from '../Toast/ToastContainer';
 
 interface FloodNotification {
@@ -39,6 +40,7 @@ const NotificationsManager: React.FC = () => {
   const [filterSeverity, setFilterSeverity] = useState<string>('');
   const [filterRegion, setFilterRegion] = useState<string>('');
   const [adminKey] = useState(localStorage.getItem('admin_key') || '');
+  const changeFeed = useChangeFeed<FloodNotification>('notifications', 'notification_id', setNotifications, adminKey);
   const { toasts, removeToast, showSuccess, showError } = useToast();
 
   const regions = [
@@ -51,6 +53,7 @@ const NotificationsManager: React.FC = () => {
     if (!adminKey) return;
     setLoading(true);
     try {
+      await changeFeed.reset();
       let url = `${API_ENDPOINTS.ADMIN_NOTIFICATIONS}?admin_key=${adminKey}`;
       if (filterSeverity) url += `&severity=${filterSeverity}`;
       if (filterRegion) url += `&region=${filterRegion}`;
@@ -68,6 +71,12 @@ const NotificationsManager: React.FC = () => {
     setLoading(false);
   };
 
+  const refreshNotifications = async () => {
+    const keep = (n: FloodNotification) =>
+      (!filterSeverity || n.severity === filterSeverity) && (!filterRegion || n.affected_regions.includes(filterRegion));
+    if (!(await changeFeed.sync(keep))) await fetchNotifications();
+  };
+
   const createNotification = async () => {
     if (!adminKey) return;
     try {
@@ -78,7 +87,7 @@ const NotificationsManager: React.FC = () => {
       });
       if (response.ok) {
         showSuccess('Created', 'Notification created successfully.');
-        await fetchNotifications();
+        await refreshNotifications();
         setShowCreateModal(false);
         resetForm();
       } else {
@@ -98,7 +107,7 @@ const NotificationsManager: React.FC = () => {
         { method: 'PUT', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(formData) }
       );
       if (response.ok) {
-        await fetchNotifications();
+        await refreshNotifications();
         setEditingNotification(null);
         resetForm();
       }
@@ -114,7 +123,7 @@ const NotificationsManager: React.FC = () => {
         `${API_ENDPOINTS.ADMIN_NOTIFICATIONS}/${id}?admin_key=${adminKey}`,
         { method: 'DELETE' }
       );
-      if (response.ok) await fetchNotifications();
+      if (response.ok) await refreshNotifications();
     } catch (error) {
       console.error('Delete failed:', error);
     }
@@ -3,6 +3,7 @@ import React, { useState, useEffect } from 'react';
 import './RequestManagement.css';
 import API_ENDPOINTS from '../../config/api';
 import useToast from '../../hooks/useToast';
+import useChangeFeed from '../../hooks/useChangeFeed';
 import ToastContainer from '../Toast/ToastContainer';
 
 interface Request {
@@ -43,6 +44,7 @@ const RequestManagement: React.FC = () => {
   const [adminNote, setAdminNote] = useState('');
   const [newNote, setNewNote] = useState('');
   const [adminKey] = useState(localStorage.getItem('admin_key') || '');
+  const changeFeed = useChangeFeed<Request>('requests', 'request_id', setRequests, adminKey);
   const { toasts, removeToast, showSuccess, showError } = useToast();
 
   const statusOptions = ['pending', 'in_progress', 'resolved', 'cancelled'];
@@ -52,6 +54,7 @@ const RequestManagement: React.FC = () => {
 
     try {
       setLoading(true);
+      await changeFeed.reset();
       let url = `${API_ENDPOINTS.ADMIN_REQUESTS}?admin_key=${adminKey}`;
       
       if (statusFilter) url += `&status=${statusFilter}`;
@@ -75,6 +78,11 @@ const RequestManagement: React.FC = () => {
 
 
 
+  const refreshRequests = async () => {
+    // Free-text search is matched server-side, so only plain views take deltas
+    if (searchTerm || !(await changeFeed.sync(r => !statusFilter || r.status === statusFilter))) await fetchRequests();
+  };
+
   const updateRequestStatus = async () => {
     if (!selectedRequest || !newStatus) return;
 
@@ -89,7 +97,7 @@ const RequestManagement: React.FC = () => {
 
     if (response.ok) {
       showSuccess('Success', 'Status updated');
-      fetchRequests();
+      refreshRequests();
       setShowStatusModal(false);
       setNewStatus('');
       setAdminNote('');
@@ -115,7 +123,7 @@ const RequestManagement: React.FC = () => {
 
       if (response.ok) {
         showSuccess('Success', 'Note added successfully');
-        await fetchRequests();
+        await refreshRequests();
         setShowNoteModal(false);
         setNewNote('');
         
@@ -3,6 +3,7 @@ import React, { useState, useEffect } from 'react';
 import './UserManagement.css';
 import API_ENDPOINTS from '../../config/api';
 import useToast from '../../hooks/useToast';
+import useChangeFeed from '../../hooks/useChangeFeed';
 import ToastContainer from '../Toast/ToastContainer';
 
 interface User {
@@ -25,12 +26,14 @@ const UserManagement: React.FC = () => {
   const [newPassword, setNewPassword] = useState('');
   const [editFormData, setEditFormData] = useState<Partial<User>>({});
   const [adminKey] = useState(localStorage.getItem('admin_key') || '');
+  const changeFeed = useChangeFeed<User>('users', 'user_id', setUsers, adminKey);
   const { toasts, removeToast, showSuccess, showError } = useToast();
 
   const fetchUsers = async () => {
     if (!adminKey) return;
 
     setLoading(true);
+    await changeFeed.reset();
     let url = `${API_ENDPOINTS.ADMIN_USERS}?admin_key=${adminKey}`;
     
     if (searchTerm) url += `&search=${encodeURIComponent(searchTerm)}`;
@@ -54,6 +57,11 @@ const UserManagement: React.FC = () => {
 
 
 
+  const refreshUsers = async () => {
+    // Free-text search is matched server-side, so only plain views take deltas
+    if (searchTerm || !(await changeFeed.sync(u => !roleFilter || u.role === roleFilter))) await fetchUsers();
+  };
+
   const handleResetPassword = async () => {
     if (!selectedUser || !newPassword) return;
 
@@ -90,7 +98,7 @@ const UserManagement: React.FC = () => {
 
     if (response.ok) {
       showSuccess('Success', 'Profile updated');
-      fetchUsers();
+      refreshUsers();
       setShowEditModal(false);
       setEditFormData({});
       setSelectedUser(null);
@@ -109,7 +117,7 @@ const UserManagement: React.FC = () => {
 
       if (response.ok) {
         showSuccess('Success', 'User deleted');
-        fetchUsers();
+        refreshUsers();
       } else {
         showError('Error', 'Failed to delete user');
       }
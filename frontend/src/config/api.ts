@@ -12,6 +12,7 @@ export const API_ENDPOINTS = {
   ADMIN_REQUESTS: `${API_BASE_URL}/admin/requests/all`,
   ADMIN_NOTIFICATIONS: `${API_BASE_URL}/admin/notifications`,
   ADMIN_ANNOUNCEMENTS: `${API_BASE_URL}/admin/announcements`,
+  ADMIN_CHANGES: `${API_BASE_URL}/admin/changes`,
   
   POSTS: `${API_BASE_URL}/posts`,
   
@@ -0,0 +1,75 @@
+import { useRef, useCallback } from 'react'
+import type { Dispatch, SetStateAction } from 'react'
+import API_ENDPOINTS from '../config/api'
+
+interface ChangeFeedResponse<T> {
+  cursor: string
+  changes: T[]
+  deleted: string[]
+  reset: boolean
+}
+
+// Keeps a list in sync through /admin/changes instead of refetching it whole.
+// Call reset() right before a full load, then sync() after each mutation;
+// sync() resolves to false when the caller has to fall back to a full load.
+// `keep` mirrors any server-side filter so changed items that no longer
+// match it drop out of the list.
+const useChangeFeed = <T>(
+  entity: string,
+  idKey: keyof T,
+  setItems: Dispatch<SetStateAction<T[]>>,
+  adminKey: string
+) => {
+  const cursor = useRef<string | null>(null)
+
+  const reset = useCallback(async () => {
+    cursor.current = null
+    try {
+      const response = await fetch(`${API_ENDPOINTS.ADMIN_CHANGES}/${entity}?admin_key=${adminKey}`)
+      if (response.ok) {
+        const data: ChangeFeedResponse<T> = await response.json()
+        cursor.current = data.cursor
+      }
+    } catch (error) {
+      console.error('Change feed reset failed:', error)
+    }
+  }, [entity, adminKey])
+
+  const sync = useCallback(async (keep: (item: T) => boolean = () => true): Promise<boolean> => {
+    if (!cursor.current) return false
+    try {
+      const response = await fetch(
+        `${API_ENDPOINTS.ADMIN_CHANGES}/${entity}?admin_key=${adminKey}&updated_since=${encodeURIComponent(cursor.current)}`
+      )
+      if (!response.ok) return false
+      const data: ChangeFeedResponse<T> = await response.json()
+      if (data.reset) return false
+      cursor.current = data.cursor
+
+      const deleted = new Set(data.deleted)
+      const changed = new Map(data.changes.map(item => [String(item[idKey]), item]))
+      setItems(prev => {
+        const pending = new Map(changed)
+        const next = prev
+          .filter(item => !deleted.has(String(item[idKey])))
+          .map(item => {
+            const id = String(item[idKey])
+            const updated = pending.get(id)
+            pending.delete(id)
+            return updated ?? item
+          })
+          .filter(keep)
+        // Whatever is left was created since the last load
+        return [...[...pending.values()].filter(keep), ...next]
+      })
+      return true
+    } catch (error) {
+      console.error('Change feed sync failed:', error)
+      return false
+    }
+  }, [entity, idKey, setItems, adminKey])
+
+  return { reset, sync }
+}
+
+export default useChangeFeed